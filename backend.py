@@ -106,7 +106,7 @@ async def export_data(format: str):
                 last_results = msg['metadata']['data']
                 break
         
-        if not last_results:
+        if last_results is None or len(last_results) == 0:
             raise HTTPException(status_code=404, detail="No query results available for export")
         
         # Convert to DataFrame
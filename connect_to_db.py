@@ -1,22 +1,12 @@
+import os
 import pyodbc
+from dotenv import load_dotenv
 
-# Replace these with your actual Azure SQL Database values
-server = 'aakan-sql-server.database.windows.net'
-database = 'chatdb'
-username = 'aakanadmin'
-password = 'B@BnH$ShDK6&Tq8X'  # 👈 replace with your real password
-
-# Connection string using ODBC Driver 18
-conn_str = (
-    'DRIVER={ODBC Driver 18 for SQL Server};'
-    'SERVER=aakan-sql-server.database.windows.net,1433;'
-    f'DATABASE={database};'
-    f'UID={username};'
-    f'PWD={password};'
-    'Encrypt=yes;'
-    'TrustServerCertificate=no;'
-    'Connection Timeout=30;'
-)
+# Use the same connection string as the chatbot
+load_dotenv()
+conn_str = os.getenv('AZURE_SQL_CONNECTION_STRING')
+if not conn_str:
+    raise ValueError("AZURE_SQL_CONNECTION_STRING environment variable is not set")
 
 try:
     # Attempt to connect
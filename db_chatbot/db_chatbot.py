@@ -1,28 +1,32 @@
 import os
+import re
+import html
+import logging
 import pandas as pd
-import pyodbc
 from openai import AzureOpenAI
-import matplotlib.pyplot as plt
-import seaborn as sns
 from datetime import datetime
 import json
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, FrozenSet, Deque, Tuple
 import numpy as np
 from io import StringIO
 from dotenv import load_dotenv
 from sqlalchemy import create_engine, text
 import urllib.parse
-import warnings
+import sys
 import time
+import threading
+import weakref
+from functools import lru_cache
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from .advanced_queries import NATURAL_LANGUAGE_EXAMPLES
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import textwrap
 
 # Load environment variables from .env file
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Database connection settings
 AZURE_SQL_CONNECTION_STRING = os.getenv('AZURE_SQL_CONNECTION_STRING')
 if not AZURE_SQL_CONNECTION_STRING:
@@ -42,13 +46,361 @@ AZURE_OPENAI_ENDPOINT = os.getenv('AZURE_OPENAI_ENDPOINT')
 if not AZURE_OPENAI_ENDPOINT:
     raise ValueError("AZURE_OPENAI_ENDPOINT environment variable is not set")
 
-# Suppress specific FutureWarning
-warnings.filterwarnings('ignore', category=FutureWarning, module='seaborn.categorical')
+# Columns returned by pyodbc as datetime.date objects that should be parsed up front
+DATE_COLUMNS = ('doj', 'start_date', 'end_date')
+
+# Aggregates precomputed by refresh_metrics() so common questions skip a table scan
+METRIC_QUERIES = {
+    'total_employees': "SELECT COUNT(*) FROM employees",
+    'average_salary': "SELECT AVG(salary) FROM employees",
+    'average_performance': "SELECT AVG(performance_score) FROM employees"
+}
+
+# Natural language questions answered directly from the precomputed metrics
+METRIC_QUESTIONS = {
+    'how many employees are there': 'total_employees',
+    'how many employees do we have': 'total_employees',
+    'what is the total number of employees': 'total_employees',
+    'what is the average salary': 'average_salary',
+    'what is the average performance score': 'average_performance'
+}
+
+# Seconds before precomputed metrics are refreshed from the database
+METRIC_TTL = 300
+
+# Query results are reused for RESULT_CACHE_TTL seconds, keeping at most RESULT_CACHE_SIZE frames
+RESULT_CACHE_TTL = 60.0
+RESULT_CACHE_SIZE = 64
+
+# Batch queries fetched concurrently; matches the engine's pool_size
+BATCH_WORKERS = 5
+
+# Row cap for charts that plot individual points
+MAX_PLOT_POINTS = 5000
+
+# Rows serialized per write when exporting JSON or Excel
+EXPORT_CHUNK_ROWS = 50_000
+
+# Worksheet size limits of the .xlsx format
+EXCEL_MAX_ROWS = 1_048_576
+EXCEL_MAX_COLS = 16_384
+
+# Shown at startup and by the 'help' command
+HELP_TEXT = """
+Available commands:
+- 'export <format> <query>': Export results
+  Formats: csv, sql, excel, json, ndjson, parquet
+- 'batch <file>': Run every query in a file (one per line)
+- 'quit': Exit the program
+- 'help': Show this help message
+- 'context': Show current conversation context
+- 'suggest': Get query suggestions based on current context
+- 'refresh': Clear cached results and schema information
+
+Example queries:
+- show me all employees
+- what are the top 5 highest paid employees?
+- how many employees are in each department?
+- group the results by department
+- show me project performance metrics
+- analyze employee performance and contributions
+- give me department analysis
+- show me time-based trends
+- analyze employee skills
+- show me project success metrics
+
+The chatbot will automatically:
+- Generate appropriate SQL queries
+- Provide data analysis and insights
+- Create relevant visualizations
+- Maintain conversation context
+- Suggest related queries
+- Handle errors gracefully"""
+
+# Page written by visualize_data; filled with str.format, so literal CSS braces are doubled
+REPORT_TEMPLATE = """
+<html>
+<head>
+    <style>
+        body {{ font-family: Arial, sans-serif; margin: 20px; }}
+        .container {{ max-width: 1200px; margin: 0 auto; }}
+        .header {{ text-align: center; margin-bottom: 30px; }}
+        .insights {{ background-color: #f8f9fa; padding: 20px; border-radius: 10px; margin-bottom: 20px; }}
+        .visualizations {{ display: grid; grid-template-columns: repeat(auto-fit, minmax(300px, 1fr)); gap: 20px; }}
+        .viz-item {{ border: 1px solid #ddd; padding: 10px; border-radius: 5px; }}
+        h1 {{ color: #2c3e50; }}
+        h2 {{ color: #34495e; }}
+        li {{ margin-bottom: 10px; }}
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>Data Analysis Report</h1>
+            <p>Generated on {generated}</p>
+        </div>
+        
+        <div class="insights">
+            <h2>Key Insights</h2>
+            <ul>
+                {insights}
+            </ul>
+        </div>
+        
+        <div class="visualizations">
+            <h2>Interactive Visualizations</h2>
+            {visualizations}
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+# Keyword groups used to classify queries, matched as whole words or phrases
+TOPIC_KEYWORDS = {
+    'department': frozenset({'department', 'departments', 'dept'}),
+    'salary': frozenset({'salary', 'salaries', 'paid', 'compensation'}),
+    'performance': frozenset({'performance', 'score', 'scores', 'rating', 'ratings'}),
+    'skills': frozenset({'skills', 'skill', 'expertise', 'capabilities'}),
+    'time': frozenset({'trend', 'trends', 'time', 'year', 'years', 'month', 'months', 'date', 'dates'})
+}
+
+METRIC_KEYWORDS = {
+    'salary': TOPIC_KEYWORDS['salary'],
+    'performance': TOPIC_KEYWORDS['performance'],
+    'count': frozenset({'count', 'number', 'how many'}),
+    'average': frozenset({'average', 'mean', 'avg'})
+}
+
+# Checked in order so the first department mentioned wins
+DEPARTMENTS = ('engineering', 'sales', 'marketing', 'hr', 'finance')
+
+# One alternation over every keyword, longest first so phrases win over their words
+CLASSIFY_PATTERN = re.compile(r'\b(' + '|'.join(map(re.escape, sorted(
+    frozenset(DEPARTMENTS).union(*TOPIC_KEYWORDS.values(), *METRIC_KEYWORDS.values()),
+    key=len, reverse=True
+))) + r')\b')
+
+def classify(query: str) -> FrozenSet[str]:
+    """Return the set of known keywords that occur in a query."""
+    return frozenset(CLASSIFY_PATTERN.findall(query.lower()))
+
+@lru_cache(maxsize=128)
+def suggest_queries(last_topic: Optional[str], last_department: Optional[str], last_metric: Optional[str],
+                    last_query: str, recent_queries: Tuple[str, ...]) -> Tuple[str, ...]:
+    """Generate query suggestions for a conversation context (cached per context)."""
+    # Insertion-ordered set of unique suggestions
+    suggestions: Dict[str, None] = {}
+    
+    # Lowercase once and use set membership for every candidate check below
+    recent_lower = frozenset(q.lower() for q in recent_queries)
+    last_query_keywords = classify(last_query)
+    
+    def _add(candidates: List[str]) -> bool:
+        """Add unseen candidates; return True once five suggestions are collected."""
+        for s in candidates:
+            if len(suggestions) >= 5:
+                return True
+            if s in suggestions or s.lower() in recent_lower:
+                continue
+            suggestions[s] = None
+        return len(suggestions) >= 5
+    
+    # Default suggestions if no context
+    default_suggestions = [
+        "Show me all employees",
+        "What are the top 5 highest paid employees?",
+        "How many employees are in each department?",
+        "Show me project performance metrics",
+        "Analyze employee performance and contributions"
+    ]
+    
+    if not any([last_topic, last_department, last_metric]):
+        return tuple(s for s in default_suggestions if s.lower() not in recent_lower)
+    
+    # 1. Department-based suggestions
+    if last_topic == 'department' or last_department:
+        if last_department:
+            # Specific department suggestions
+            dept_suggestions = [
+                f"Show me the top performers in {last_department}",
+                f"What is the average salary in {last_department}?",
+                f"List all employees in {last_department} by performance score",
+                f"Show me the skills distribution in {last_department}",
+                f"Compare {last_department} performance with other departments"
+            ]
+            if _add(dept_suggestions):
+                return tuple(suggestions)
+        
+        # General department suggestions
+        general_dept_suggestions = [
+            "Compare department performance metrics",
+            "Show me department-wise salary distribution",
+            "Which department has the highest average performance?",
+            "Show me the largest department by employee count",
+            "Compare department hiring trends"
+        ]
+        if _add(general_dept_suggestions):
+            return tuple(suggestions)
+    
+    # 2. Salary-based suggestions
+    if last_metric == 'salary' or 'salary' in last_query_keywords:
+        salary_suggestions = [
+            "Show me salary trends over time",
+            "Compare salaries across departments",
+            "Who are the top 5 highest paid employees?",
+            "Show me the salary distribution by department",
+            "What's the salary range in each department?"
+        ]
+        if _add(salary_suggestions):
+            return tuple(suggestions)
+    
+    # 3. Performance-based suggestions
+    if last_metric == 'performance' or 'performance' in last_query_keywords:
+        performance_suggestions = [
+            "Show me performance trends over time",
+            "Compare performance across departments",
+            "Who are the top 5 performers?",
+            "Show me the performance distribution",
+            "Which department has the most consistent performance?"
+        ]
+        if _add(performance_suggestions):
+            return tuple(suggestions)
+    
+    # 4. Skills-based suggestions
+    if last_topic == 'skills' or 'skills' in last_query_keywords:
+        skills_suggestions = [
+            "Show me employees with specific skills",
+            "What are the most common skills?",
+            "Which skills are associated with higher salaries?",
+            "Show me skill distribution by department",
+            "Which skills are most common in top performers?"
+        ]
+        if _add(skills_suggestions):
+            return tuple(suggestions)
+    
+    # 5. Time-based suggestions
+    if last_topic == 'time' or last_query_keywords & TOPIC_KEYWORDS['time']:
+        time_suggestions = [
+            "Show me hiring trends by department",
+            "Compare hiring patterns across years",
+            "Show me employee retention rates",
+            "Which department has grown the most?",
+            "Show me the average tenure by department"
+        ]
+        if _add(time_suggestions):
+            return tuple(suggestions)
+    
+    # 6. General suggestions (always included)
+    general_suggestions = [
+        "Show me recent hiring trends",
+        "Analyze employee performance distribution",
+        "Compare department sizes",
+        "Show me the overall salary distribution",
+        "What are the most common skills?"
+    ]
+    
+    # Add general suggestions if we don't have enough context-specific ones
+    if len(suggestions) < 3:
+        _add(general_suggestions)
+    
+    # If we still don't have enough suggestions, add from default suggestions
+    if len(suggestions) < 3:
+        _add(default_suggestions)
+    
+    return tuple(suggestions)
+
+@lru_cache(maxsize=256)
+def generate_sql_for(query: str) -> str:
+    """Map a normalized (lowercased, whitespace-collapsed) query to SQL."""
+    # Define expected columns
+    expected_columns = [
+        'id', 'name', 'department', 'salary', 
+        'doj', 'manager_id', 'performance_score', 'skills'
+    ]
+    
+    # Base SELECT statement with all columns
+    base_select = f"""
+        SELECT 
+            {', '.join(expected_columns)}
+        FROM employees
+    """
+    
+    if query == "show me all employees":
+        return base_select
+    
+    if "top" in query and "paid" in query:
+        limit = 5  # default
+        if "5" in query:
+            limit = 5
+        elif "10" in query:
+            limit = 10
+        return f"""
+            SELECT TOP {limit}
+                {', '.join(expected_columns)}
+            FROM employees 
+            ORDER BY salary DESC
+        """
+    
+    if "how many employees" in query and "department" in query:
+        return """
+            SELECT 
+                department,
+                COUNT(*) as employee_count 
+            FROM employees 
+            GROUP BY department
+        """
+    
+    if "group" in query and "department" in query:
+        return """
+            SELECT 
+                department,
+                COUNT(*) as employee_count,
+                AVG(salary) as avg_salary,
+                AVG(performance_score) as avg_performance
+            FROM employees 
+            GROUP BY department
+        """
+    
+    if "performance" in query:
+        return """
+            SELECT 
+                department,
+                AVG(performance_score) as avg_performance,
+                COUNT(*) as employee_count
+            FROM employees
+            GROUP BY department
+            ORDER BY avg_performance DESC
+        """
+    
+    if "skills" in query:
+        return """
+            SELECT 
+                department,
+                STRING_AGG(DISTINCT skills, ', ') as unique_skills,
+                COUNT(DISTINCT skills) as skill_count
+            FROM employees
+            GROUP BY department
+        """
+    
+    if "trends" in query or "hiring" in query:
+        return """
+            SELECT 
+                YEAR(doj) as hire_year,
+                COUNT(*) as new_employees
+            FROM employees
+            GROUP BY YEAR(doj)
+            ORDER BY hire_year
+        """
+    
+    # Default query if no specific pattern matches
+    return base_select
 
 class ChatMemory:
     def __init__(self, max_turns: int = 10):
         self.max_turns = max_turns
-        self.conversation_history: List[Dict[str, Any]] = []
+        # Bounded deques evict the oldest entries in O(1) instead of re-slicing
+        self.conversation_history: Deque[Dict[str, Any]] = deque(maxlen=max_turns * 2)
         self.current_context = {
             'last_topic': None,
             'last_department': None,
@@ -56,14 +408,15 @@ class ChatMemory:
             'last_query': None,
             'last_results': None,
             'last_analysis': None,
-            'query_history': []
+            'query_history': deque(maxlen=self.max_turns)
         }
         
     def add_message(self, role: str, content: str, metadata: Optional[Dict[str, Any]] = None):
         message = {
             "role": role,
             "content": content,
-            "timestamp": datetime.now().isoformat(),
+            # Epoch seconds; format with datetime.fromtimestamp() only when displayed
+            "timestamp": time.time(),
             "metadata": metadata or {}
         }
         self.conversation_history.append(message)
@@ -72,8 +425,6 @@ class ChatMemory:
         if role == 'user':
             self.current_context['last_query'] = content
             self.current_context['query_history'].append(content)
-            if len(self.current_context['query_history']) > self.max_turns:
-                self.current_context['query_history'] = self.current_context['query_history'][-self.max_turns:]
         
         if metadata:
             if 'results' in metadata:
@@ -86,18 +437,15 @@ class ChatMemory:
                 self.current_context['last_department'] = metadata['department']
             if 'metric' in metadata:
                 self.current_context['last_metric'] = metadata['metric']
-        
-        if len(self.conversation_history) > self.max_turns * 2:
-            self.conversation_history = self.conversation_history[-self.max_turns*2:]
     
     def get_context(self) -> List[Dict[str, Any]]:
-        return self.conversation_history
+        return list(self.conversation_history)
     
     def get_current_context(self) -> Dict[str, Any]:
         return self.current_context
     
     def clear(self):
-        self.conversation_history = []
+        self.conversation_history = deque(maxlen=self.max_turns * 2)
         self.current_context = {
             'last_topic': None,
             'last_department': None,
@@ -105,7 +453,7 @@ class ChatMemory:
             'last_query': None,
             'last_results': None,
             'last_analysis': None,
-            'query_history': []
+            'query_history': deque(maxlen=self.max_turns)
         }
 
     def get_formatted_history(self) -> str:
@@ -117,7 +465,7 @@ class ChatMemory:
 class DatabaseChatbot:
     def __init__(self):
         """Initialize the chatbot with conversation context and state management."""
-        self.conn = None
+        self.engine = None
         self.last_query = None
         self.last_analysis = None
         self.conversation_context = {
@@ -127,186 +475,80 @@ class DatabaseChatbot:
             'query_history': []
         }
         self.chat_memory = ChatMemory()
+        self._metrics: Dict[str, Any] = {}
+        self._metrics_refreshed = 0.0
+        self._schema_cache: Optional[str] = None
+        self._result_cache: OrderedDict = OrderedDict()
+        # Batch queries execute on worker threads that share the result cache
+        self._cache_lock = threading.Lock()
+        self._frame_summary: Optional[Tuple[weakref.ref, Dict[str, Any]]] = None
+        # Command name -> (handler, usage line for commands that take an argument)
+        self._commands = {
+            'help': (self.print_help, None),
+            'context': (self._print_context, None),
+            'suggest': (self._print_suggestions, None),
+            'refresh': (self._refresh, None),
+            'batch': (self.process_batch, 'batch <file>')
+        }
+        # Report sections of analyze_data, in output order
+        self._analysis_sections = {
+            'summary': self._analyze_summary,
+            'metrics': self._analyze_metrics,
+            'skills': self._analyze_skills,
+            'hiring': self._analyze_hiring,
+            'insights': self._analyze_insights
+        }
         self.initialize_database()
         print("Database Chatbot initialized successfully!")
         self.print_help()
 
     def print_help(self):
         """Print enhanced help information with examples and guidance."""
-        print("\nAvailable commands:")
-        print("- 'export <format> <query>': Export results")
-        print("  Formats: csv, sql, excel, json")
-        print("- 'quit': Exit the program")
-        print("- 'help': Show this help message")
-        print("- 'context': Show current conversation context")
-        print("- 'suggest': Get query suggestions based on current context")
-        
-        print("\nExample queries:")
-        print("- show me all employees")
-        print("- what are the top 5 highest paid employees?")
-        print("- how many employees are in each department?")
-        print("- group the results by department")
-        print("- show me project performance metrics")
-        print("- analyze employee performance and contributions")
-        print("- give me department analysis")
-        print("- show me time-based trends")
-        print("- analyze employee skills")
-        print("- show me project success metrics")
-        
-        print("\nThe chatbot will automatically:")
-        print("- Generate appropriate SQL queries")
-        print("- Provide data analysis and insights")
-        print("- Create relevant visualizations")
-        print("- Maintain conversation context")
-        print("- Suggest related queries")
-        print("- Handle errors gracefully")
+        print(HELP_TEXT)
 
     def update_conversation_context(self, query, analysis=None):
         """Update the conversation context based on the current query and analysis."""
         self.conversation_context['query_history'].append(query)
         
         # Extract topic from query
-        query = query.lower()
+        matched = classify(query)
         
         # Department detection
-        if 'department' in query:
+        if matched & TOPIC_KEYWORDS['department']:
             self.conversation_context['last_topic'] = 'department'
             # Try to extract specific department
-            for dept in ['engineering', 'sales', 'marketing', 'hr', 'finance']:
-                if dept in query:
-                    self.conversation_context['last_department'] = dept
-                    break
+            dept = self.extract_department(matched)
+            if dept:
+                self.conversation_context['last_department'] = dept
         
         # Metric detection
-        if 'salary' in query or 'paid' in query:
+        if matched & TOPIC_KEYWORDS['salary']:
             self.conversation_context['last_metric'] = 'salary'
-        elif 'performance' in query or 'score' in query:
+        elif matched & TOPIC_KEYWORDS['performance']:
             self.conversation_context['last_metric'] = 'performance'
-        elif 'skills' in query:
+        elif matched & TOPIC_KEYWORDS['skills']:
             self.conversation_context['last_topic'] = 'skills'
         
         # Time-based detection
-        if 'trend' in query or 'time' in query or 'year' in query:
+        if matched & TOPIC_KEYWORDS['time']:
             self.conversation_context['last_topic'] = 'time'
         
         # Store the last query for reference
-        self.last_query = query
+        self.last_query = query.lower()
         
         if analysis:
             self.last_analysis = analysis
 
     def get_suggested_queries(self):
         """Generate relevant query suggestions based on conversation context."""
-        suggestions = []
-        
-        # Get current context
         context = self.chat_memory.get_current_context()
-        last_topic = context.get('last_topic')
-        last_department = context.get('last_department')
-        last_metric = context.get('last_metric')
-        last_query = context.get('last_query', '')
-        recent_queries = context.get('query_history', [])
-        
-        # Default suggestions if no context
-        default_suggestions = [
-            "Show me all employees",
-            "What are the top 5 highest paid employees?",
-            "How many employees are in each department?",
-            "Show me project performance metrics",
-            "Analyze employee performance and contributions"
-        ]
-        
-        if not any([last_topic, last_department, last_metric]):
-            return [s for s in default_suggestions if s.lower() not in [q.lower() for q in recent_queries]]
-        
-        # 1. Department-based suggestions
-        if last_topic == 'department' or last_department:
-            if last_department:
-                # Specific department suggestions
-                dept_suggestions = [
-                    f"Show me the top performers in {last_department}",
-                    f"What is the average salary in {last_department}?",
-                    f"List all employees in {last_department} by performance score",
-                    f"Show me the skills distribution in {last_department}",
-                    f"Compare {last_department} performance with other departments"
-                ]
-                suggestions.extend([s for s in dept_suggestions if s.lower() not in [q.lower() for q in recent_queries]])
-            
-            # General department suggestions
-            general_dept_suggestions = [
-                "Compare department performance metrics",
-                "Show me department-wise salary distribution",
-                "Which department has the highest average performance?",
-                "Show me the largest department by employee count",
-                "Compare department hiring trends"
-            ]
-            suggestions.extend([s for s in general_dept_suggestions if s.lower() not in [q.lower() for q in recent_queries]])
-        
-        # 2. Salary-based suggestions
-        if last_metric == 'salary' or 'salary' in last_query.lower():
-            salary_suggestions = [
-                "Show me salary trends over time",
-                "Compare salaries across departments",
-                "Who are the top 5 highest paid employees?",
-                "Show me the salary distribution by department",
-                "What's the salary range in each department?"
-            ]
-            suggestions.extend([s for s in salary_suggestions if s.lower() not in [q.lower() for q in recent_queries]])
-        
-        # 3. Performance-based suggestions
-        if last_metric == 'performance' or 'performance' in last_query.lower():
-            performance_suggestions = [
-                "Show me performance trends over time",
-                "Compare performance across departments",
-                "Who are the top 5 performers?",
-                "Show me the performance distribution",
-                "Which department has the most consistent performance?"
-            ]
-            suggestions.extend([s for s in performance_suggestions if s.lower() not in [q.lower() for q in recent_queries]])
-        
-        # 4. Skills-based suggestions
-        if last_topic == 'skills' or 'skills' in last_query.lower():
-            skills_suggestions = [
-                "Show me employees with specific skills",
-                "What are the most common skills?",
-                "Which skills are associated with higher salaries?",
-                "Show me skill distribution by department",
-                "Which skills are most common in top performers?"
-            ]
-            suggestions.extend([s for s in skills_suggestions if s.lower() not in [q.lower() for q in recent_queries]])
-        
-        # 5. Time-based suggestions
-        if last_topic == 'time' or any(word in last_query.lower() for word in ['trend', 'time', 'year', 'month', 'date']):
-            time_suggestions = [
-                "Show me hiring trends by department",
-                "Compare hiring patterns across years",
-                "Show me employee retention rates",
-                "Which department has grown the most?",
-                "Show me the average tenure by department"
-            ]
-            suggestions.extend([s for s in time_suggestions if s.lower() not in [q.lower() for q in recent_queries]])
-        
-        # 6. General suggestions (always included)
-        general_suggestions = [
-            "Show me recent hiring trends",
-            "Analyze employee performance distribution",
-            "Compare department sizes",
-            "Show me the overall salary distribution",
-            "What are the most common skills?"
-        ]
-        
-        # Add general suggestions if we don't have enough context-specific ones
-        if len(suggestions) < 3:
-            suggestions.extend([s for s in general_suggestions if s.lower() not in [q.lower() for q in recent_queries]])
-        
-        # If we still don't have enough suggestions, add from default suggestions
-        if len(suggestions) < 3:
-            suggestions.extend([s for s in default_suggestions if s.lower() not in [q.lower() for q in recent_queries]])
-        
-        # Remove duplicates and limit to 5 suggestions
-        suggestions = list(dict.fromkeys(suggestions))[:5]
-        
-        return suggestions
+        return list(suggest_queries(
+            context.get('last_topic'),
+            context.get('last_department'),
+            context.get('last_metric'),
+            context.get('last_query') or '',
+            tuple(context.get('query_history', ()))
+        ))
 
     def handle_error(self, error, query):
         """Provide helpful error messages and suggestions."""
@@ -340,111 +582,203 @@ class DatabaseChatbot:
     def process_query(self, query):
         """Process user query with enhanced error handling and context management."""
         try:
-            if query.lower() == 'help':
-                self.print_help()
-                return
-            
-            if query.lower() == 'context':
-                context = self.chat_memory.get_current_context()
-                print("\nCurrent Conversation Context:")
-                print(f"Last Topic: {context['last_topic']}")
-                print(f"Last Department: {context['last_department']}")
-                print(f"Last Metric: {context['last_metric']}")
-                print("\nRecent Queries:")
-                for q in context['query_history'][-3:]:
-                    print(f"- {q}")
-                return
-            
-            if query.lower() == 'suggest':
-                print("\nSuggested queries based on context:")
-                for i, suggestion in enumerate(self.get_suggested_queries(), 1):
-                    print(f"{i}. {suggestion}")
+            # Built-in commands are dispatched before any SQL generation
+            if self._dispatch_command(query):
                 return
             
             # Add user query to memory
             self.chat_memory.add_message('user', query)
             
+            # Precomputed metrics are answered directly, with no query or analysis
+            if self._answer_metric(query):
+                return
+            
             # Generate and execute SQL query
             sql_query = self.generate_sql_query(query)
             results = self.execute_query(sql_query)
-            
-            if results is not None and not results.empty:
-                # Add SQL query to memory
-                self.chat_memory.add_message('assistant', sql_query, {'type': 'sql'})
-                
-                print("\nQuery Results:")
-                print(results)
-                
-                # Generate analysis
-                analysis = self.analyze_data(results)
-                print("\nAnalysis:")
-                print(analysis)
-                
-                # Add results and analysis to memory with metadata
-                self.chat_memory.add_message('assistant', str(results), {
-                    'type': 'results',
-                    'data': results.to_dict('records'),
-                    'topic': self.extract_topic(query),
-                    'department': self.extract_department(query),
-                    'metric': self.extract_metric(query)
-                })
-                
-                self.chat_memory.add_message('assistant', analysis, {
-                    'type': 'analysis',
-                    'data': analysis
-                })
-                
-                # Generate visualizations
-                viz_message = self.visualize_data(results)
-                print("\n" + viz_message)
-                
-                # Provide follow-up suggestions
-                print("\nYou might also want to know:")
-                for suggestion in self.get_suggested_queries()[:3]:
-                    print(f"- {suggestion}")
+            self._report_results(query, sql_query, results)
             
         except Exception as e:
             self.handle_error(e, query)
 
-    def extract_topic(self, query: str) -> Optional[str]:
-        """Extract the main topic from a query."""
-        query = query.lower()
-        topics = {
-            'department': ['department', 'dept'],
-            'salary': ['salary', 'paid', 'compensation'],
-            'performance': ['performance', 'score', 'rating'],
-            'skills': ['skills', 'expertise', 'capabilities'],
-            'time': ['trend', 'time', 'year', 'month', 'date']
-        }
+    def _answer_metric(self, query: str) -> bool:
+        """Print a precomputed metric if query asks for one; return whether it did."""
+        metric = self.match_metric(query)
+        if metric is None:
+            return False
         
-        for topic, keywords in topics.items():
-            if any(keyword in query for keyword in keywords):
-                return topic
-        return None
+        value = self.get_metric(metric)
+        answer = f"{metric.replace('_', ' ').capitalize()}: {'unknown' if value is None else value}"
+        matched = classify(query)
+        self.chat_memory.add_message('assistant', answer, {
+            'type': 'metric',
+            'data': value,
+            'topic': self.extract_topic(matched),
+            'department': self.extract_department(matched),
+            'metric': self.extract_metric(matched)
+        })
         
-    def extract_department(self, query: str) -> Optional[str]:
-        """Extract department from a query."""
-        query = query.lower()
-        departments = ['engineering', 'sales', 'marketing', 'hr', 'finance']
-        for dept in departments:
-            if dept in query:
-                return dept
-        return None
+        output_parts = ["\n" + answer, "\nYou might also want to know:"]
+        output_parts.extend(f"- {suggestion}" for suggestion in self.get_suggested_queries()[:3])
+        sys.stdout.write("\n".join(output_parts) + "\n")
+        return True
+
+    def _dispatch_command(self, query: str) -> bool:
+        """Run query as a built-in command if it is one; return whether it was."""
+        name, _, arg = query.strip().partition(' ')
+        arg = arg.strip()
+        entry = self._commands.get(name.lower())
+        if entry is None:
+            return False
+        handler, usage = entry
+        if usage is None:
+            # Plain commands must be the whole input ('help me ...' is a question)
+            if arg:
+                return False
+            handler()
+        elif arg:
+            handler(arg)
+        else:
+            print(f"\nUsage: {usage}")
+        return True
+
+    def _report_results(self, query: str, sql_query: str, results: pd.DataFrame):
+        """Analyze, visualize and print the results of one query, recording them in memory."""
+        if results is not None and not results.empty:
+            # Add SQL query to memory
+            self.chat_memory.add_message('assistant', sql_query, {'type': 'sql'})
+            
+            # Collect the whole response and write it to stdout in one call
+            output_parts = ["\nQuery Results:", str(results)]
+            
+            # Generate analysis
+            analysis = self.analyze_data(results)
+            output_parts.extend(["\nAnalysis:", analysis])
+            
+            # Add results and analysis to memory with metadata
+            matched = classify(query)
+            # Keep a reference to the frame rather than exploding it into per-row dicts
+            self.chat_memory.add_message('assistant', results.to_string(max_rows=20), {
+                'type': 'results',
+                'data': results,
+                'topic': self.extract_topic(matched),
+                'department': self.extract_department(matched),
+                'metric': self.extract_metric(matched)
+            })
+            
+            self.chat_memory.add_message('assistant', analysis, {
+                'type': 'analysis',
+                'data': analysis
+            })
+            
+            # Generate visualizations
+            viz_message = self.visualize_data(results)
+            output_parts.append("\n" + viz_message)
+            
+            # Provide follow-up suggestions
+            output_parts.append("\nYou might also want to know:")
+            output_parts.extend(f"- {suggestion}" for suggestion in self.get_suggested_queries()[:3])
+            
+            sys.stdout.write("\n".join(output_parts) + "\n")
+
+    def _print_context(self):
+        """Print the current conversation context."""
+        context = self.chat_memory.get_current_context()
+        print("\nCurrent Conversation Context:")
+        print(f"Last Topic: {context['last_topic']}")
+        print(f"Last Department: {context['last_department']}")
+        print(f"Last Metric: {context['last_metric']}")
+        print("\nRecent Queries:")
+        for q in list(context['query_history'])[-3:]:
+            print(f"- {q}")
+
+    def _print_suggestions(self):
+        """Print query suggestions based on the current context."""
+        print("\nSuggested queries based on context:")
+        for i, suggestion in enumerate(self.get_suggested_queries(), 1):
+            print(f"{i}. {suggestion}")
+
+    def _refresh(self):
+        """Clear all caches so the next queries read fresh data."""
+        self.clear_cache()
+        print("\nCached results, metrics and schema information cleared.")
+
+    def process_batch(self, filename: str):
+        """Process every natural language query in a file, one per line."""
+        try:
+            with open(filename, 'r') as f:
+                queries = [line.strip() for line in f if line.strip()]
+        except OSError as e:
+            print(f"\nCould not read batch file: {str(e)}")
+            return
         
-    def extract_metric(self, query: str) -> Optional[str]:
-        """Extract metric from a query."""
-        query = query.lower()
-        metrics = {
-            'salary': ['salary', 'paid', 'compensation'],
-            'performance': ['performance', 'score', 'rating'],
-            'count': ['count', 'number', 'how many'],
-            'average': ['average', 'mean', 'avg']
-        }
+        # Generate all SQL first, then fetch every result concurrently through the
+        # engine's connection pool; analysis and output still follow input order
+        planned = []
+        for query in queries:
+            # Commands and precomputed metrics need no fetch; they run in order below
+            if query.split(' ', 1)[0].lower() in self._commands or self.match_metric(query):
+                planned.append((query, None, None))
+                continue
+            try:
+                planned.append((query, self.generate_sql_query(query), None))
+            except Exception as e:
+                planned.append((query, None, e))
+        
+        with ThreadPoolExecutor(max_workers=BATCH_WORKERS) as executor:
+            futures = [
+                executor.submit(self.execute_query, sql_query) if sql_query is not None else None
+                for _, sql_query, _ in planned
+            ]
+            for (query, sql_query, error), future in zip(planned, futures):
+                print(f"\n>>> {query}")
+                if query.split(' ', 1)[0].lower() == 'batch':
+                    # A batch file naming itself (or a cycle of files) would never end
+                    print("\nSkipping nested batch command; batch files cannot run other batches.")
+                    continue
+                if sql_query is None and error is None:
+                    # Built-in command, metric question, or text that only looks like a command
+                    self.process_query(query)
+                    continue
+                try:
+                    self.chat_memory.add_message('user', query)
+                    if error is not None:
+                        raise error
+                    self._report_results(query, sql_query, future.result())
+                except Exception as e:
+                    self.handle_error(e, query)
+
+    def extract_topic(self, matched: FrozenSet[str]) -> Optional[str]:
+        """Extract the main topic from a classified query."""
+        return next((topic for topic, keywords in TOPIC_KEYWORDS.items() if keywords & matched), None)
+        
+    def extract_department(self, matched: FrozenSet[str]) -> Optional[str]:
+        """Extract department from a classified query."""
+        return next((dept for dept in DEPARTMENTS if dept in matched), None)
         
-        for metric, keywords in metrics.items():
-            if any(keyword in query for keyword in keywords):
-                return metric
-        return None
+    def extract_metric(self, matched: FrozenSet[str]) -> Optional[str]:
+        """Extract metric from a classified query."""
+        return next((metric for metric, keywords in METRIC_KEYWORDS.items() if keywords & matched), None)
+
+    def match_metric(self, query: str) -> Optional[str]:
+        """Return the precomputed metric a question asks for, if any."""
+        normalized = " ".join(query.lower().rstrip('?.! ').split())
+        # Exact match only: a qualifier such as "in HR" or "by dept" changes the
+        # answer, so near misses must fall through to a scoped query
+        return METRIC_QUESTIONS.get(normalized)
+
+    def refresh_metrics(self):
+        """Recompute all registered metrics from the database."""
+        with self.engine.connect() as conn:
+            for name, sql in METRIC_QUERIES.items():
+                self._metrics[name] = conn.exec_driver_sql(sql).scalar()
+        self._metrics_refreshed = time.time()
+
+    def get_metric(self, name: str) -> Any:
+        """Get a precomputed metric, refreshing all metrics once they are stale."""
+        if time.time() - self._metrics_refreshed > METRIC_TTL:
+            self.refresh_metrics()
+        return self._metrics.get(name)
 
     def initialize_database(self):
         """Initialize the database connection and test it."""
@@ -457,13 +791,20 @@ class DatabaseChatbot:
             if not connection_string:
                 raise ValueError("AZURE_SQL_CONNECTION_STRING not found in environment variables")
             
-            # Create connection
-            self.conn = pyodbc.connect(connection_string)
+            # Create a pooled engine so each query checks out an open connection
+            params = urllib.parse.quote_plus(connection_string)
+            self.engine = create_engine(
+                f"mssql+pyodbc:///?odbc_connect={params}",
+                pool_size=5,
+                max_overflow=10,
+                pool_pre_ping=True,
+                # Send executemany() parameter arrays in one round-trip for bulk inserts
+                fast_executemany=True
+            )
             
             # Test connection with a simple query
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT 1")
-            cursor.close()
+            with self.engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
             
             print("Database connection successful!")
             
@@ -472,141 +813,66 @@ class DatabaseChatbot:
 
     def get_schema_info(self) -> str:
         """Get database schema information."""
+        # Schema rarely changes during a session; reuse the formatted text until refreshed
+        if self._schema_cache is not None:
+            return self._schema_cache
+        
         try:
-            cursor = self.conn.cursor()
-            
-            # Get table information
-            cursor.execute("""
-                SELECT 
-                    t.name AS table_name,
-                    c.name AS column_name,
-                    ty.name AS data_type,
-                    c.max_length,
-                    c.precision,
-                    c.scale,
-                    c.is_nullable
-                FROM sys.tables t
-                INNER JOIN sys.columns c ON t.object_id = c.object_id
-                INNER JOIN sys.types ty ON c.user_type_id = ty.user_type_id
-                ORDER BY t.name, c.column_id;
-            """)
-            
-            # Get results
-            columns = [column[0] for column in cursor.description]
-            results = cursor.fetchall()
-            
-            # Create DataFrame
-            schema_df = pd.DataFrame(results, columns=columns)
-            
-            # Close cursor
-            cursor.close()
+            # Get table information (rows arrive ordered by table, then column)
+            with self.engine.connect() as conn:
+                rows = conn.exec_driver_sql("""
+                    SELECT 
+                        t.name AS table_name,
+                        c.name AS column_name,
+                        ty.name AS data_type,
+                        c.is_nullable
+                    FROM sys.tables t
+                    INNER JOIN sys.columns c ON t.object_id = c.object_id
+                    INNER JOIN sys.types ty ON c.user_type_id = ty.user_type_id
+                    ORDER BY t.name, c.column_id;
+                """).fetchall()
             
             # Format schema information
             schema_info = []
             current_table = None
             
-            for _, row in schema_df.iterrows():
-                if row['table_name'] != current_table:
-                    current_table = row['table_name']
+            for table_name, column_name, data_type, is_nullable in rows:
+                if table_name != current_table:
+                    current_table = table_name
                     schema_info.append(f"\nTable: {current_table}")
                     schema_info.append("-" * (len(current_table) + 7))
                 
-                nullable = "NULL" if row['is_nullable'] else "NOT NULL"
-                schema_info.append(f"  {row['column_name']}: {row['data_type']} {nullable}")
+                nullable = "NULL" if is_nullable else "NOT NULL"
+                schema_info.append(f"  {column_name}: {data_type} {nullable}")
             
-            return "\n".join(schema_info)
+            self._schema_cache = "\n".join(schema_info)
+            return self._schema_cache
             
         except Exception as e:
             raise Exception(f"Error getting schema information: {str(e)}")
 
+    def clear_cache(self):
+        """Drop cached query results, metrics and schema information."""
+        with self._cache_lock:
+            self._result_cache.clear()
+        self._metrics_refreshed = 0.0
+        self.refresh_schema()
+
+    def refresh_schema(self):
+        """Discard cached schema information so the next lookup re-queries it."""
+        self._schema_cache = None
+
     def generate_sql_query(self, query: str) -> str:
         """Generate SQL query from natural language input."""
         try:
-            # Define expected columns
-            expected_columns = [
-                'id', 'name', 'department', 'salary', 
-                'doj', 'manager_id', 'performance_score', 'skills'
-            ]
-            
-            # Simple query mapping for common requests
-            query = query.lower().strip()
-            
-            # Base SELECT statement with all columns
-            base_select = f"""
-                SELECT 
-                    {', '.join(expected_columns)}
-                FROM employees
-            """
+            # Answer common aggregate questions from precomputed metrics
+            metric = self.match_metric(query)
+            if metric is not None:
+                value = self.get_metric(metric)
+                return f"SELECT {'NULL' if value is None else value} AS {metric}"
             
-            if query == "show me all employees":
-                return base_select
-            
-            if "top" in query and "paid" in query:
-                limit = 5  # default
-                if "5" in query:
-                    limit = 5
-                elif "10" in query:
-                    limit = 10
-                return f"""
-                    SELECT TOP {limit}
-                        {', '.join(expected_columns)}
-                    FROM employees 
-                    ORDER BY salary DESC
-                """
-            
-            if "how many employees" in query and "department" in query:
-                return """
-                    SELECT 
-                        department,
-                        COUNT(*) as employee_count 
-                    FROM employees 
-                    GROUP BY department
-                """
-            
-            if "group" in query and "department" in query:
-                return """
-                    SELECT 
-                        department,
-                        COUNT(*) as employee_count,
-                        AVG(salary) as avg_salary,
-                        AVG(performance_score) as avg_performance
-                    FROM employees 
-                    GROUP BY department
-                """
-            
-            if "performance" in query:
-                return """
-                    SELECT 
-                        department,
-                        AVG(performance_score) as avg_performance,
-                        COUNT(*) as employee_count
-                    FROM employees
-                    GROUP BY department
-                    ORDER BY avg_performance DESC
-                """
-            
-            if "skills" in query:
-                return """
-                    SELECT 
-                        department,
-                        STRING_AGG(DISTINCT skills, ', ') as unique_skills,
-                        COUNT(DISTINCT skills) as skill_count
-                    FROM employees
-                    GROUP BY department
-                """
-            
-            if "trends" in query or "hiring" in query:
-                return """
-                    SELECT 
-                        YEAR(doj) as hire_year,
-                        COUNT(*) as new_employees
-                    FROM employees
-                    GROUP BY YEAR(doj)
-                    ORDER BY hire_year
-                """
-            
-            # Default query if no specific pattern matches
-            return base_select
+            # Rule-based SQL depends only on the normalized text, so repeats hit the cache
+            return generate_sql_for(" ".join(query.lower().split()))
             
         except Exception as e:
             raise Exception(f"Error generating SQL query: {str(e)}")
@@ -614,136 +880,236 @@ class DatabaseChatbot:
     def execute_query(self, query: str) -> pd.DataFrame:
         """Execute SQL query and return results as DataFrame."""
         try:
-            # Log the SQL query for debugging
-            print("\n🛠 Executing SQL:", query)
-            
-            cursor = self.conn.cursor()
-            cursor.execute(query)
-            
-            # Get column names from cursor description
-            columns = [column[0] for column in cursor.description]
-            
-            # Fetch all results
-            results = cursor.fetchall()
-            
-            # Validate column count
-            if results and len(results[0]) != len(columns):
-                raise ValueError(f"Column count mismatch: got {len(results[0])} columns, expected {len(columns)}")
-            
-            # Create DataFrame with explicit column mapping
-            if results:
-                # Convert results to list of lists
-                data = [list(row) for row in results]
-                # Create DataFrame with explicit columns
-                df = pd.DataFrame(data, columns=columns)
-            else:
-                # Create empty DataFrame with correct columns
-                df = pd.DataFrame(columns=columns)
-            
-            # Close cursor
-            cursor.close()
-            
-            return df
+            # Serve repeated queries from the result cache while it is fresh
+            key = " ".join(query.split())
+            now = time.time()
+            with self._cache_lock:
+                entry = self._result_cache.get(key)
+                if entry is not None and now - entry[0] < RESULT_CACHE_TTL:
+                    self._result_cache.move_to_end(key)
+                    # Shallow copy so callers adding columns don't alter the cached frame
+                    return entry[1].copy(deep=False)
+            
+            # Log the SQL query for debugging; enable with logging.basicConfig(level=logging.DEBUG)
+            logger.debug("Executing SQL: %s", query)
+            
+            # Check out a pooled connection; read_sql builds the frame straight from the cursor
+            with self.engine.connect() as conn:
+                df = pd.read_sql(query, conn)
+            
+            if not df.empty:
+                df = self._normalize_dtypes(df)
+            
+            with self._cache_lock:
+                self._result_cache[key] = (now, df)
+                self._result_cache.move_to_end(key)
+                if len(self._result_cache) > RESULT_CACHE_SIZE:
+                    self._result_cache.popitem(last=False)
+            
+            return df.copy(deep=False)
             
         except Exception as e:
             raise Exception(f"Error executing query: {str(e)}")
 
-    def analyze_data(self, df: pd.DataFrame) -> str:
-        """Analyze data and return focused, actionable insights."""
-        try:
-            analysis = []
-            
-            # 1. Quick Summary
-            analysis.append("📊 QUICK SUMMARY")
-            analysis.append("=" * 50)
-            analysis.append(f"Total Employees: {len(df):,}")
-            if 'department' in df.columns:
-                dept_counts = df['department'].value_counts()
-                analysis.append("\nDepartment Distribution:")
-                for dept, count in dept_counts.items():
-                    analysis.append(f"  • {dept}: {count:,} employees")
-            
-            # 2. Key Metrics
-            analysis.append("\n📈 KEY METRICS")
-            analysis.append("=" * 50)
-            
+    def _normalize_dtypes(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Convert object columns from the driver into native numpy dtypes."""
+        # Parse known date columns so .dt accessors work without re-parsing later
+        for col in df.columns.intersection(DATE_COLUMNS):
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+        
+        # Decimal values (e.g. AVG over DECIMAL columns) arrive as Python objects;
+        # text columns are left alone even if they look numeric (codes, zip codes)
+        for col in df.select_dtypes(include=['object']).columns:
+            if pd.api.types.infer_dtype(df[col], skipna=True) == 'decimal':
+                df[col] = pd.to_numeric(df[col])
+        
+        # Identifiers, salaries, scores and counts all fit in narrower integer types.
+        # Floats stay float64: callers and exports read this frame, and float32
+        # would turn a score of 4.7 into 4.699999809265137
+        for col in df.select_dtypes(include=['int64']).columns:
+            df[col] = pd.to_numeric(df[col], downcast='integer')
+        
+        # Grouping on category codes avoids hashing every department string
+        if 'department' in df.columns and df['department'].dtype == object:
+            df['department'] = df['department'].astype('category')
+        
+        return df
+
+    def _summary_cache(self, df: pd.DataFrame) -> Dict[str, Any]:
+        """Return the aggregate memo for df, starting a new one for a different frame."""
+        # analyze_data and visualize_data run back to back on the same frame; a weak
+        # reference means a recycled id() can never match a stale entry
+        if self._frame_summary is None or self._frame_summary[0]() is not df:
+            self._frame_summary = (weakref.ref(df), {})
+        return self._frame_summary[1]
+
+    def _ensure_datetime(self, df: pd.DataFrame) -> pd.Series:
+        """Return hire years for df, parsing doj at most once per frame."""
+        cache = self._summary_cache(df)
+        if 'years' not in cache:
+            # Results from execute_query are already parsed; only raw frames pay for this
+            if not pd.api.types.is_datetime64_any_dtype(df['doj']):
+                df['doj'] = pd.to_datetime(df['doj'], errors='coerce', cache=True)
+            cache['years'] = df['doj'].dt.year.astype('Int16')
+        return cache['years']
+
+    def _yearly_hires(self, df: pd.DataFrame) -> pd.Series:
+        """Return the number of employees hired in each year."""
+        cache = self._summary_cache(df)
+        if 'yearly_hires' not in cache:
+            cache['yearly_hires'] = df.groupby(self._ensure_datetime(df)).size()
+        return cache['yearly_hires']
+
+    def _dept_counts(self, df: pd.DataFrame) -> pd.Series:
+        """Return employees per department, largest first."""
+        cache = self._summary_cache(df)
+        if 'dept_counts' not in cache:
+            # observed=True skips categories with no rows in this result
+            cache['dept_counts'] = df.groupby('department', observed=True).size().sort_values(ascending=False)
+        return cache['dept_counts']
+
+    def _skill_counts(self, df: pd.DataFrame) -> pd.Series:
+        """Return how many employees list each skill, most common first."""
+        cache = self._summary_cache(df)
+        if 'skill_counts' not in cache:
+            skills_series = df['skills'].dropna().str.split(',', regex=False).explode().str.strip()
+            # Drop empty tokens left by trailing or doubled commas
+            cache['skill_counts'] = skills_series[skills_series.astype(bool)].value_counts()
+        return cache['skill_counts']
+
+    def _dept_stats(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Return per-department salary and performance aggregates."""
+        cache = self._summary_cache(df)
+        if 'dept_stats' not in cache:
+            # Factorize department once and compute every per-department statistic from it
+            agg_spec = {}
             if 'salary' in df.columns:
-                analysis.append("\nSalary Analysis:")
-                analysis.append(f"  • Average Salary: ${df['salary'].mean():,.2f}")
-                analysis.append(f"  • Highest Salary: ${df['salary'].max():,.2f}")
-                analysis.append(f"  • Lowest Salary: ${df['salary'].min():,.2f}")
-                
-                if 'department' in df.columns:
-                    dept_salaries = df.groupby('department')['salary'].agg(['mean', 'min', 'max'])
-                    analysis.append("\nSalary by Department:")
-                    for dept, stats in dept_salaries.iterrows():
-                        analysis.append(f"  • {dept}:")
-                        analysis.append(f"    - Average: ${stats['mean']:,.2f}")
-                        analysis.append(f"    - Range: ${stats['min']:,.2f} - ${stats['max']:,.2f}")
-            
+                agg_spec.update(
+                    salary_mean=('salary', 'mean'),
+                    salary_min=('salary', 'min'),
+                    salary_max=('salary', 'max')
+                )
             if 'performance_score' in df.columns:
-                analysis.append("\nPerformance Analysis:")
-                analysis.append(f"  • Average Performance: {df['performance_score'].mean():.2f}/5.0")
-                analysis.append(f"  • Top Performers: {len(df[df['performance_score'] >= 4.5]):,} employees")
-                
-                if 'department' in df.columns:
-                    dept_performance = df.groupby('department')['performance_score'].mean()
-                    analysis.append("\nPerformance by Department:")
-                    for dept, score in dept_performance.items():
-                        analysis.append(f"  • {dept}: {score:.2f}/5.0")
-            
-            # 3. Skills Analysis
-            if 'skills' in df.columns:
-                analysis.append("\n🔧 SKILLS ANALYSIS")
-                analysis.append("=" * 50)
-                
-                # Count individual skills
-                all_skills = []
-                for skills in df['skills']:
-                    all_skills.extend([s.strip() for s in skills.split(',')])
-                skill_counts = pd.Series(all_skills).value_counts()
-                
-                analysis.append("\nTop Skills:")
-                for skill, count in skill_counts.head(5).items():
-                    analysis.append(f"  • {skill}: {count:,} employees")
-            
-            # 4. Hiring Trends
-            if 'doj' in df.columns:
-                analysis.append("\n📅 HIRING TRENDS")
-                analysis.append("=" * 50)
-                
-                df['doj'] = pd.to_datetime(df['doj'])
-                yearly_hires = df.groupby(df['doj'].dt.year).size()
-                
-                analysis.append("\nYearly Hiring:")
-                for year, count in yearly_hires.items():
-                    analysis.append(f"  • {year}: {count:,} new employees")
-            
-            # 5. Key Insights
-            analysis.append("\n💡 KEY INSIGHTS")
-            analysis.append("=" * 50)
-            
-            # Add insights based on the data
-            if 'salary' in df.columns and 'department' in df.columns:
-                highest_paid_dept = df.groupby('department')['salary'].mean().idxmax()
-                analysis.append(f"  • {highest_paid_dept} department has the highest average salary")
-            
-            if 'performance_score' in df.columns and 'department' in df.columns:
-                best_performing_dept = df.groupby('department')['performance_score'].mean().idxmax()
-                analysis.append(f"  • {best_performing_dept} department shows the best performance")
+                agg_spec['perf_mean'] = ('performance_score', 'mean')
+            cache['dept_stats'] = df.groupby('department', observed=True).agg(**agg_spec)
+        return cache['dept_stats']
+
+    def analyze_data(self, df: pd.DataFrame, sections: Optional[FrozenSet[str]] = None) -> str:
+        """Analyze data and return focused, actionable insights (all sections by default)."""
+        try:
+            analysis = []
             
-            if 'skills' in df.columns:
-                most_common_skill = skill_counts.index[0]
-                analysis.append(f"  • {most_common_skill} is the most common skill")
+            for name, section in self._analysis_sections.items():
+                if sections is not None and name not in sections:
+                    continue
+                start = time.perf_counter()
+                section(df, analysis)
+                logger.debug("analyze_data %s: %.2f ms for %d rows",
+                             name, (time.perf_counter() - start) * 1000, len(df))
             
             return "\n".join(analysis)
             
         except Exception as e:
             return f"Error analyzing data: {str(e)}"
 
+    def _analyze_summary(self, df: pd.DataFrame, analysis: List[str]):
+        """Append the employee and department overview."""
+        analysis.append("📊 QUICK SUMMARY")
+        analysis.append("=" * 50)
+        analysis.append(f"Total Employees: {len(df):,}")
+        if 'department' in df.columns:
+            dept_counts = self._dept_counts(df)
+            
+            analysis.append("\nDepartment Distribution:")
+            analysis.extend(
+                f"  • {dept}: {count:,} employees"
+                for dept, count in zip(dept_counts.index.to_numpy(), dept_counts.to_numpy())
+            )
+
+    def _analyze_metrics(self, df: pd.DataFrame, analysis: List[str]):
+        """Append salary and performance statistics."""
+        analysis.append("\n📈 KEY METRICS")
+        analysis.append("=" * 50)
+        
+        if 'salary' in df.columns:
+            analysis.append("\nSalary Analysis:")
+            analysis.append(f"  • Average Salary: ${df['salary'].mean():,.2f}")
+            analysis.append(f"  • Highest Salary: ${df['salary'].max():,.2f}")
+            analysis.append(f"  • Lowest Salary: ${df['salary'].min():,.2f}")
+            
+            if 'department' in df.columns:
+                dept_stats = self._dept_stats(df)
+                analysis.append("\nSalary by Department:")
+                # Plain numpy columns avoid building a pandas object per department
+                for dept, mean, low, high in zip(
+                    dept_stats.index.to_numpy(),
+                    dept_stats['salary_mean'].to_numpy(),
+                    dept_stats['salary_min'].to_numpy(),
+                    dept_stats['salary_max'].to_numpy()
+                ):
+                    analysis.append(f"  • {dept}:")
+                    analysis.append(f"    - Average: ${mean:,.2f}")
+                    analysis.append(f"    - Range: ${low:,.2f} - ${high:,.2f}")
+        
+        if 'performance_score' in df.columns:
+            analysis.append("\nPerformance Analysis:")
+            analysis.append(f"  • Average Performance: {df['performance_score'].mean():.2f}/5.0")
+            top_performers = int((df['performance_score'] >= 4.5).sum())
+            analysis.append(f"  • Top Performers: {top_performers:,} employees")
+            
+            if 'department' in df.columns:
+                dept_stats = self._dept_stats(df)
+                analysis.append("\nPerformance by Department:")
+                analysis.extend(
+                    f"  • {dept}: {score:.2f}/5.0"
+                    for dept, score in zip(dept_stats.index.to_numpy(), dept_stats['perf_mean'].to_numpy())
+                )
+
+    def _analyze_skills(self, df: pd.DataFrame, analysis: List[str]):
+        """Append the most common skills."""
+        if 'skills' not in df.columns:
+            return
+        analysis.append("\n🔧 SKILLS ANALYSIS")
+        analysis.append("=" * 50)
+        
+        analysis.append("\nTop Skills:")
+        for skill, count in self._skill_counts(df).head(5).items():
+            analysis.append(f"  • {skill}: {count:,} employees")
+
+    def _analyze_hiring(self, df: pd.DataFrame, analysis: List[str]):
+        """Append hires per year."""
+        if 'doj' not in df.columns:
+            return
+        analysis.append("\n📅 HIRING TRENDS")
+        analysis.append("=" * 50)
+        
+        analysis.append("\nYearly Hiring:")
+        for year, count in self._yearly_hires(df).items():
+            analysis.append(f"  • {year}: {count:,} new employees")
+
+    def _analyze_insights(self, df: pd.DataFrame, analysis: List[str]):
+        """Append one-line takeaways, reusing the aggregates of the other sections."""
+        analysis.append("\n💡 KEY INSIGHTS")
+        analysis.append("=" * 50)
+        
+        if 'salary' in df.columns and 'department' in df.columns:
+            highest_paid_dept = self._dept_stats(df)['salary_mean'].idxmax()
+            analysis.append(f"  • {highest_paid_dept} department has the highest average salary")
+        
+        if 'performance_score' in df.columns and 'department' in df.columns:
+            best_performing_dept = self._dept_stats(df)['perf_mean'].idxmax()
+            analysis.append(f"  • {best_performing_dept} department shows the best performance")
+        
+        if 'skills' in df.columns:
+            most_common_skill = self._skill_counts(df).index[0]
+            analysis.append(f"  • {most_common_skill} is the most common skill")
+
     def visualize_data(self, df: pd.DataFrame) -> str:
         """Create beautiful and interactive visualizations based on data."""
         try:
+            # plotly takes most of a second to import; only pay for it when charting
+            import plotly.express as px
+            
             # Create timestamp for unique filenames
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             base_filename = f"visualization_{timestamp}"
@@ -751,19 +1117,21 @@ class DatabaseChatbot:
             # Create visualizations directory if it doesn't exist
             os.makedirs('visualizations', exist_ok=True)
             
-            # Get numeric and categorical columns
-            numeric_cols = df.select_dtypes(include=[np.number]).columns
-            categorical_cols = df.select_dtypes(include=['object']).columns
-            
-            visualizations = []
+            charts = []
             insights = []
             
+            # Box and scatter plots embed every point; past a few thousand rows a
+            # sample draws the same picture and keeps the HTML small
+            plot_df = df.sample(n=MAX_PLOT_POINTS, random_state=0) if len(df) > MAX_PLOT_POINTS else df
+            
             # 1. Department Distribution (if department column exists)
             if 'department' in df.columns:
-                # Create a beautiful pie chart with plotly
+                dept_counts = self._dept_counts(df)
+                
+                # Create a beautiful pie chart with plotly from the counts, not the raw rows
                 fig = px.pie(
-                    df, 
-                    names='department',
+                    values=dept_counts.to_numpy(),
+                    names=dept_counts.index.to_numpy(),
                     title='Employee Distribution by Department',
                     color_discrete_sequence=px.colors.qualitative.Set3
                 )
@@ -774,11 +1142,9 @@ class DatabaseChatbot:
                     showlegend=True,
                     legend_title="Departments"
                 )
-                fig.write_html(f'visualizations/{base_filename}_department_pie.html')
-                visualizations.append(f'visualizations/{base_filename}_department_pie.html')
+                charts.append((fig, f'visualizations/{base_filename}_department_pie.html'))
                 
                 # Add insight
-                dept_counts = df['department'].value_counts()
                 largest_dept = dept_counts.index[0]
                 smallest_dept = dept_counts.index[-1]
                 insights.append(f"• {largest_dept} is the largest department with {dept_counts[largest_dept]} employees")
@@ -788,7 +1154,7 @@ class DatabaseChatbot:
             if 'salary' in df.columns:
                 # Create a beautiful box plot
                 fig = px.box(
-                    df,
+                    plot_df,
                     x='department',
                     y='salary',
                     title='Salary Distribution by Department',
@@ -803,8 +1169,7 @@ class DatabaseChatbot:
                     yaxis_title="Salary",
                     showlegend=False
                 )
-                fig.write_html(f'visualizations/{base_filename}_salary_box.html')
-                visualizations.append(f'visualizations/{base_filename}_salary_box.html')
+                charts.append((fig, f'visualizations/{base_filename}_salary_box.html'))
                 
                 # Add salary insights
                 avg_salary = df['salary'].mean()
@@ -817,7 +1182,7 @@ class DatabaseChatbot:
             if 'performance_score' in df.columns:
                 # Create a beautiful scatter plot
                 fig = px.scatter(
-                    df,
+                    plot_df,
                     x='salary',
                     y='performance_score',
                     color='department',
@@ -832,17 +1197,16 @@ class DatabaseChatbot:
                     xaxis_title="Salary",
                     yaxis_title="Performance Score"
                 )
-                fig.write_html(f'visualizations/{base_filename}_performance_scatter.html')
-                visualizations.append(f'visualizations/{base_filename}_performance_scatter.html')
+                charts.append((fig, f'visualizations/{base_filename}_performance_scatter.html'))
                 
                 # Add performance insights
-                best_performer = df.loc[df['performance_score'].idxmax()]
+                # Positional argmax skips the label lookup (and still ignores NaN)
+                best_performer = df.iloc[df['performance_score'].argmax()]
                 insights.append(f"• Best performing employee: {best_performer['name']} in {best_performer['department']} with score {best_performer['performance_score']}")
             
             # 4. Time-based Analysis (if doj exists)
             if 'doj' in df.columns:
-                df['doj'] = pd.to_datetime(df['doj'])
-                yearly_counts = df.groupby(df['doj'].dt.year)['id'].count().reset_index()
+                yearly_counts = self._yearly_hires(df).reset_index()
                 yearly_counts.columns = ['Year', 'Count']
                 
                 # Create a beautiful line chart
@@ -859,20 +1223,16 @@ class DatabaseChatbot:
                     xaxis_title="Year",
                     yaxis_title="Number of Employees Hired"
                 )
-                fig.write_html(f'visualizations/{base_filename}_hiring_trends.html')
-                visualizations.append(f'visualizations/{base_filename}_hiring_trends.html')
+                charts.append((fig, f'visualizations/{base_filename}_hiring_trends.html'))
                 
                 # Add hiring trend insights
-                max_year = yearly_counts.loc[yearly_counts['Count'].idxmax()]
+                max_year = yearly_counts.iloc[yearly_counts['Count'].argmax()]
                 insights.append(f"• Highest hiring year: {max_year['Year']} with {max_year['Count']} new employees")
             
             # 5. Skills Analysis (if skills exists)
             if 'skills' in df.columns:
-                # Split skills and count occurrences
-                all_skills = []
-                for skills in df['skills']:
-                    all_skills.extend([s.strip() for s in skills.split(',')])
-                skill_counts = pd.Series(all_skills).value_counts().head(10)
+                # Reuse the skill counts from the analysis pass
+                skill_counts = self._skill_counts(df).head(10)
                 
                 # Create a beautiful bar chart
                 fig = px.bar(
@@ -889,51 +1249,28 @@ class DatabaseChatbot:
                     yaxis_title="Count",
                     xaxis_tickangle=45
                 )
-                fig.write_html(f'visualizations/{base_filename}_skills_dist.html')
-                visualizations.append(f'visualizations/{base_filename}_skills_dist.html')
+                charts.append((fig, f'visualizations/{base_filename}_skills_dist.html'))
                 
                 # Add skills insights
                 top_skill = skill_counts.index[0]
                 insights.append(f"• Most common skill: {top_skill} with {skill_counts[top_skill]} employees")
             
+            # Serialize and write the charts concurrently; plotly.js is loaded from
+            # the CDN instead of embedding ~3.5MB in every chart file
+            with ThreadPoolExecutor(max_workers=max(len(charts), 1)) as executor:
+                list(executor.map(lambda chart: chart[0].write_html(chart[1], include_plotlyjs='cdn'), charts))
+            visualizations = [path for _, path in charts]
+            
             # Generate a beautiful HTML report
-            report = f"""
-            <html>
-            <head>
-                <style>
-                    body {{ font-family: Arial, sans-serif; margin: 20px; }}
-                    .container {{ max-width: 1200px; margin: 0 auto; }}
-                    .header {{ text-align: center; margin-bottom: 30px; }}
-                    .insights {{ background-color: #f8f9fa; padding: 20px; border-radius: 10px; margin-bottom: 20px; }}
-                    .visualizations {{ display: grid; grid-template-columns: repeat(auto-fit, minmax(300px, 1fr)); gap: 20px; }}
-                    .viz-item {{ border: 1px solid #ddd; padding: 10px; border-radius: 5px; }}
-                    h1 {{ color: #2c3e50; }}
-                    h2 {{ color: #34495e; }}
-                    li {{ margin-bottom: 10px; }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <div class="header">
-                        <h1>Data Analysis Report</h1>
-                        <p>Generated on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
-                    </div>
-                    
-                    <div class="insights">
-                        <h2>Key Insights</h2>
-                        <ul>
-                            {''.join(f'<li>{insight}</li>' for insight in insights)}
-                        </ul>
-                    </div>
-                    
-                    <div class="visualizations">
-                        <h2>Interactive Visualizations</h2>
-                        {''.join(f'<div class="viz-item"><iframe src="{viz}" width="100%" height="400px" frameborder="0"></iframe></div>' for viz in visualizations)}
-                    </div>
-                </div>
-            </body>
-            </html>
-            """
+            # Insights embed employee names and departments, so escape them
+            report = REPORT_TEMPLATE.format(
+                generated=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                insights=''.join(f'<li>{html.escape(insight)}</li>' for insight in insights),
+                visualizations=''.join(
+                    f'<div class="viz-item"><iframe src="{html.escape(viz)}" width="100%" height="400px" frameborder="0"></iframe></div>'
+                    for viz in visualizations
+                )
+            )
             
             # Save the report
             with open(f'visualizations/{base_filename}_report.html', 'w') as f:
@@ -953,8 +1290,30 @@ class DatabaseChatbot:
             """
             
         except Exception as e:
-            print(f"Error creating visualizations: {str(e)}")
-            return "Error creating visualizations"
+            # Returned rather than printed so it lands after the buffered results
+            return f"Error creating visualizations: {str(e)}"
+
+    def _write_excel_sheet(self, workbook, name: str, frame: pd.DataFrame, header_format, index: bool = False):
+        """Write frame to a new worksheet strictly in row order."""
+        header = ([''] if index else []) + [str(col) for col in frame.columns]
+        # xlsxwriter silently skips cells past the sheet limits instead of raising
+        if len(frame) + 1 > EXCEL_MAX_ROWS or len(header) > EXCEL_MAX_COLS:
+            raise ValueError(
+                f"This sheet is too large! {len(frame) + 1} rows x {len(header)} columns "
+                f"exceeds Excel's {EXCEL_MAX_ROWS} x {EXCEL_MAX_COLS} limit"
+            )
+        
+        sheet = workbook.add_worksheet(name)
+        sheet.write_row(0, 0, header, header_format)
+        
+        row_num = 1
+        for start in range(0, len(frame), EXPORT_CHUNK_ROWS):
+            # Box one chunk at a time; missing values become blank cells
+            chunk = frame.iloc[start:start + EXPORT_CHUNK_ROWS].astype(object)
+            chunk = chunk.where(chunk.notna(), None)
+            for row in chunk.itertuples(index=index, name=None):
+                sheet.write_row(row_num, 0, row)
+                row_num += 1
 
     def export_data(self, df: pd.DataFrame, format: str = 'csv') -> str:
         """Export data in various formats with enhanced metadata."""
@@ -964,11 +1323,14 @@ class DatabaseChatbot:
             if format.lower() == 'csv':
                 filename = f'query_results_{timestamp}.csv'
                 # Add metadata as comments
-                with open(filename, 'w') as f:
+                # newline='' as pandas requires for text handles; rows use the same
+                # '\n' terminator as the header lines
+                with open(filename, 'w', newline='', encoding='utf-8') as f:
                     f.write(f"# Generated: {datetime.now()}\n")
                     f.write(f"# Total Rows: {len(df)}\n")
                     f.write(f"# Columns: {', '.join(df.columns)}\n\n")
-                df.to_csv(filename, mode='a', index=False)
+                    # Write rows through the already-open handle instead of reopening in append mode
+                    df.to_csv(f, index=False, lineterminator='\n')
                 return f"Data exported to {filename}"
                 
             elif format.lower() == 'sql':
@@ -981,56 +1343,91 @@ class DatabaseChatbot:
                     f.write(", ".join(df.columns))
                     f.write(") VALUES\n")
                     
-                    for i, row in df.iterrows():
-                        values = []
-                        for val in row:
-                            if pd.isna(val):
-                                values.append("NULL")
-                            elif isinstance(val, (int, float)):
-                                values.append(str(val))
-                            else:
-                                values.append(f"'{str(val)}'")
-                        f.write("(" + ", ".join(values) + ")")
-                        if i < len(df) - 1:
-                            f.write(",\n")
+                    # Format each column as SQL literals in one vectorized pass
+                    formatted = []
+                    for col in df.columns:
+                        series = df[col]
+                        if pd.api.types.is_numeric_dtype(series):
+                            literals = series.astype(str)
                         else:
-                            f.write(";\n")
+                            # Double embedded quotes so values cannot end the literal early
+                            literals = "'" + series.astype(str).str.replace("'", "''", regex=False) + "'"
+                        formatted.append(np.where(series.isna().to_numpy(), 'NULL', literals.to_numpy(dtype=object)))
+                    
+                    if formatted and len(df):
+                        f.write(",\n".join("(" + ", ".join(row) + ")" for row in zip(*formatted)))
+                        f.write(";\n")
                 return f"Data exported to {filename}"
                 
             elif format.lower() == 'excel':
                 filename = f'query_results_{timestamp}.xlsx'
-                with pd.ExcelWriter(filename) as writer:
+                import xlsxwriter
+                # constant_memory flushes each row to disk once the next row starts, so
+                # every sheet is written row by row (pandas' to_excel goes column by column)
+                workbook = xlsxwriter.Workbook(filename, {
+                    'constant_memory': True,
+                    'default_date_format': 'yyyy-mm-dd hh:mm:ss'
+                })
+                try:
+                    header_format = workbook.add_format({'bold': True})
+                    
                     # Main data sheet
-                    df.to_excel(writer, sheet_name='Data', index=False)
+                    self._write_excel_sheet(workbook, 'Data', df, header_format)
                     
                     # Summary sheet
                     summary_df = pd.DataFrame({
                         'Metric': ['Total Rows', 'Columns', 'Generated'],
                         'Value': [len(df), len(df.columns), datetime.now()]
                     })
-                    summary_df.to_excel(writer, sheet_name='Summary', index=False)
+                    self._write_excel_sheet(workbook, 'Summary', summary_df, header_format)
                     
                     # Statistics sheet for numeric columns
                     if len(df.select_dtypes(include=[np.number]).columns) > 0:
-                        df.describe().to_excel(writer, sheet_name='Statistics')
+                        self._write_excel_sheet(workbook, 'Statistics', df.describe(), header_format, index=True)
+                finally:
+                    workbook.close()
                 return f"Data exported to {filename}"
                 
             elif format.lower() == 'json':
                 filename = f'query_results_{timestamp}.json'
-                export_data = {
-                    'metadata': {
-                        'generated': str(datetime.now()),
-                        'total_rows': len(df),
-                        'columns': list(df.columns)
-                    },
-                    'data': df.to_dict(orient='records')
+                metadata = {
+                    'generated': str(datetime.now()),
+                    'total_rows': len(df),
+                    'columns': list(df.columns)
                 }
+                # Serialize rows with pandas' C writer in bounded chunks so the full
+                # document never has to sit in memory as one string
                 with open(filename, 'w') as f:
-                    json.dump(export_data, f, indent=2)
+                    f.write('{\n  "metadata": ')
+                    f.write(json.dumps(metadata))
+                    f.write(',\n  "data": [')
+                    for start in range(0, len(df), EXPORT_CHUNK_ROWS):
+                        if start:
+                            f.write(',')
+                        chunk = df.iloc[start:start + EXPORT_CHUNK_ROWS]
+                        f.write(chunk.to_json(orient='records', date_format='iso')[1:-1])
+                    f.write(']\n}\n')
+                return f"Data exported to {filename}"
+                
+            elif format.lower() == 'ndjson':
+                filename = f'query_results_{timestamp}.ndjson'
+                # One record per line, so consumers can stream the file
+                with open(filename, 'w') as f:
+                    for start in range(0, len(df), EXPORT_CHUNK_ROWS):
+                        chunk = df.iloc[start:start + EXPORT_CHUNK_ROWS]
+                        # Newer pandas already ends the chunk with a newline; normalize to exactly one
+                        f.write(chunk.to_json(orient='records', lines=True, date_format='iso').rstrip('\n'))
+                        f.write('\n')
+                return f"Data exported to {filename}"
+                
+            elif format.lower() == 'parquet':
+                filename = f'query_results_{timestamp}.parquet'
+                # Columnar and compressed; keeps dtypes (categories, dates) for later reads
+                df.to_parquet(filename, engine='pyarrow', compression='zstd', index=False)
                 return f"Data exported to {filename}"
                 
             else:
-                return "Unsupported export format. Please use 'csv', 'sql', 'excel', or 'json'."
+                return "Unsupported export format. Please use 'csv', 'sql', 'excel', 'json', 'ndjson', or 'parquet'."
                 
         except Exception as e:
             return f"Error exporting data: {str(e)}"
@@ -1049,8 +1446,8 @@ def main():
         
         if query.lower() == 'quit':
             break
-        else:
-            chatbot.process_query(query)
+        
+        chatbot.process_query(query)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
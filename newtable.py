@@ -1,20 +1,12 @@
+import os
 import pyodbc
+from dotenv import load_dotenv
 
-server = 'aakan-sql-server.database.windows.net,1433'
-database = 'chatdb'
-username = 'aakanadmin'
-password = 'B@BnH$ShDK6&Tq8X'  # replace with your actual password
-
-conn_str = (
-    'DRIVER={ODBC Driver 18 for SQL Server};'
-    f'SERVER={server};'
-    f'DATABASE={database};'
-    f'UID={username};'
-    f'PWD={password};'
-    'Encrypt=yes;'
-    'TrustServerCertificate=no;'
-    'Connection Timeout=30;'
-)
+# Credentials come from the environment (or .env), never from source
+load_dotenv()
+conn_str = os.getenv('AZURE_SQL_CONNECTION_STRING')
+if not conn_str:
+    raise ValueError("AZURE_SQL_CONNECTION_STRING environment variable is not set")
 
 try:
     conn = pyodbc.connect(conn_str)
@@ -35,16 +27,20 @@ try:
     conn.commit()
     print("✅ Table 'employees' created or already exists.")
 
-    # Insert sample data
-    insert_data_sql = """
-    INSERT INTO employees (name, department, salary, doj) VALUES
-    ('Alice', 'Marketing', 70000, '2021-03-15'),
-    ('Bob', 'Sales', 65000, '2019-06-20'),
-    ('Charlie', 'Marketing', 72000, '2022-01-10'),
-    ('David', 'HR', 60000, '2018-11-05'),
-    ('Eva', 'Marketing', 68000, '2020-09-23');
-    """
-    cursor.execute(insert_data_sql)
+    # Insert sample data as one parameterized batch
+    sample_rows = [
+        ('Alice', 'Marketing', 70000, '2021-03-15'),
+        ('Bob', 'Sales', 65000, '2019-06-20'),
+        ('Charlie', 'Marketing', 72000, '2022-01-10'),
+        ('David', 'HR', 60000, '2018-11-05'),
+        ('Eva', 'Marketing', 68000, '2020-09-23'),
+    ]
+    # Send all parameter sets in a single round trip instead of one per row
+    cursor.fast_executemany = True
+    cursor.executemany(
+        "INSERT INTO employees (name, department, salary, doj) VALUES (?, ?, ?, ?)",
+        sample_rows
+    )
     conn.commit()
     print("✅ Sample data inserted.")
 
@@ -1,4 +1,5 @@
 import os
+import re
 import pyodbc
 from dotenv import load_dotenv
 
@@ -14,27 +15,35 @@ def setup_database():
     
     try:
         # Connect to the database
-        conn = pyodbc.connect(connection_string)
+        conn = pyodbc.connect(connection_string, autocommit=False)
         cursor = conn.cursor()
         
+        # Skip the row-count message after every statement
+        cursor.execute("SET NOCOUNT ON")
+        
         # Read and execute the SQL script
         with open('setup_database.sql', 'r') as file:
             sql_script = file.read()
             
-            # Split the script into individual statements
-            statements = sql_script.split(';')
+            # Send each GO-separated batch in one round trip; the server parses the
+            # statements, so semicolons inside string literals are harmless
+            batches = re.split(r'^\s*GO\s*$', sql_script, flags=re.IGNORECASE | re.MULTILINE)
             
-            # Execute each statement
-            for statement in statements:
-                if statement.strip():
-                    cursor.execute(statement)
+            for batch in batches:
+                if batch.strip():
+                    cursor.execute(batch)
+                    # Drain the results of every statement in the batch
+                    while cursor.nextset():
+                        pass
             
-            # Commit the changes
+            # Commit every statement as a single transaction
             conn.commit()
             
         print("Database setup completed successfully!")
         
     except Exception as e:
+        if 'conn' in locals():
+            conn.rollback()
         print(f"Error setting up database: {str(e)}")
         raise
     finally: